@@ -7,9 +7,12 @@ import numpy as np
 import paperxai.credentials as credentials
 import paperxai.constants as constants
 from paperxai.llms import OpenAI
+from paperxai.llms.cache import EmbeddingCache
+from paperxai.llms.scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE
 from paperxai.papers import Arxiv
 from paperxai.report.retriever import ReportRetriever
 from paperxai.prompt.base import Prompt
+from paperxai.report.cache import RetrievalCache
 
 ########## set up the page ##########
 st.set_page_config(
@@ -56,6 +59,14 @@ def define_api_key_input() -> str:
     else:
         return ""
     
+@st.cache_resource
+def get_report_caches() -> tuple[EmbeddingCache, RetrievalCache]:
+    # shared between reruns so the same topics are not embedded and searched again on every click
+    return (
+        EmbeddingCache(constants.ROOT_DIR + "/data/cache/question_embeddings.json"),
+        RetrievalCache(constants.ROOT_DIR + "/data/cache/retrieval_cache.json"),
+    )
+
 def format_topics(topics: list[str]) -> str:
     formatted_topics = ""
     for topic in topics:
@@ -207,7 +218,7 @@ with tab1:
                 df_papers = pd.read_csv(constants.ROOT_DIR + "/data/arxiv/current_papers.csv",
                                         parse_dates=["Published Date"])
                 df_papers["Embeddings"] = df_papers["String_representation"].apply(
-                lambda x: openai_model.get_embeddings(text=x)
+                lambda x: openai_model.get_embeddings(text=x, priority=PRIORITY_BATCH)
             )
                 papers_embeddings = df_papers["Embeddings"].values
                 papers_embeddings = np.vstack(papers_embeddings)
@@ -225,9 +236,14 @@ with tab1:
                     papers_embedding=papers_embeddings,
                     df_papers=df_papers,
                     config=report_config,
+                    query_embeddings_cache=get_report_caches()[0],
+                    retrieval_cache=get_report_caches()[1],
+                    priority=PRIORITY_INTERACTIVE,
                 )
 
                 report = report_retriever.create_report()
+                get_report_caches()[0].save()
+                get_report_caches()[1].save()
                 st.session_state.report["llm_answers"] = report["arXiv based responses"]["chat_responses"]
                 st.session_state.report["papers"] = report["arXiv based responses"]["papers"]
                 report_string = report_retriever.format_report()
@@ -0,0 +1,84 @@
+# benchmark of the paper normalization (date filtering, string representation, citations)
+# comparing the previous row by row implementation to the column-wise one
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from paperxai.papers import Arxiv
+from paperxai.report.retriever import ReportRetriever
+
+parser = argparse.ArgumentParser(description="Benchmark the normalization of arXiv papers in rows/sec")
+parser.add_argument(
+    "--n_rows",
+    type=int,
+    nargs="+",
+    default=[1000, 10000, 100000],
+    help="number of synthetic papers to normalize",
+)
+args = parser.parse_args()
+
+
+def create_synthetic_papers(n_rows: int) -> list[dict]:
+    rng = np.random.default_rng(0)
+    published_dates = datetime.now() - pd.to_timedelta(rng.integers(0, 20 * 7 * 24 * 3600, n_rows), unit="s")
+    return [
+        {
+            "Title": f"Paper title number {i}",
+            "URL": f"http://arxiv.org/abs/2308.{i:05d}v1",
+            "Abstract": "A long abstract about large language models. " * 20,
+            "Authors": f"Firstname Lastname{i}, Second Author, Third Author",
+            "Published Date": published_dates[i].strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "Category": "cs.AI",
+            "Paper ID": f"2308.{i:05d}v1",
+        }
+        for i in range(n_rows)
+    ]
+
+
+def normalize_row_by_row(arxiv: Arxiv, papers: list[dict], start_date: datetime, end_date: datetime) -> tuple[pd.DataFrame, str]:
+    # previous implementation
+    papers = [
+        paper for paper in papers
+        if start_date <= datetime.strptime(paper["Published Date"], "%Y-%m-%dT%H:%M:%SZ") <= end_date
+    ]
+    df_papers = pd.DataFrame(papers)
+    df_papers["String_representation"] = df_papers.apply(
+        lambda x: arxiv.create_string_to_embed(x), axis=1
+    )
+    df_papers["Published Date"] = pd.to_datetime(df_papers["Published Date"]).dt.tz_convert("UTC")
+    citation_list = []
+    for _, row in df_papers.iterrows():
+        citation_list.append(
+            f"<li> {row['Title']}. {row['Authors'].split(',')[0].split(' ')[-1]} et al. {row['Published Date'].strftime('%Y')}</li>"
+        )
+    return df_papers, "<ul>" + "".join(citation_list) + "</ul>"
+
+
+def normalize_column_wise(arxiv: Arxiv, retriever: ReportRetriever, papers: list[dict], start_date: datetime, end_date: datetime) -> tuple[pd.DataFrame, str]:
+    df_papers = pd.DataFrame(papers)
+    published_dates = pd.to_datetime(df_papers["Published Date"], format="%Y-%m-%dT%H:%M:%SZ")
+    df_papers = df_papers[published_dates.between(start_date, end_date)].reset_index(drop=True)
+    df_papers = arxiv.format_dataframe(df_papers)
+    return df_papers, retriever.format_paper_df_to_html_citation(df_papers)
+
+
+if __name__ == "__main__":
+    arxiv = Arxiv()
+    retriever = ReportRetriever(language_model=None, prompter=None, papers_embedding=None, df_papers=None)
+    start_date, end_date = datetime.now() - timedelta(weeks=10), datetime.now()
+    for n_rows in args.n_rows:
+        papers = create_synthetic_papers(n_rows)
+        start = time.perf_counter()
+        df_before, citations_before = normalize_row_by_row(arxiv, papers, start_date, end_date)
+        time_before = time.perf_counter() - start
+        start = time.perf_counter()
+        df_after, citations_after = normalize_column_wise(arxiv, retriever, papers, start_date, end_date)
+        time_after = time.perf_counter() - start
+        assert df_before.equals(df_after), "column-wise normalization differs from row by row"
+        assert citations_before == citations_after, "column-wise citations differ from row by row"
+        print(
+            f"{n_rows} rows: row by row {n_rows / time_before:,.0f} rows/sec, "
+            f"column-wise {n_rows / time_after:,.0f} rows/sec ({time_before / time_after:.1f}x)"
+        )
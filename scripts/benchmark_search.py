@@ -0,0 +1,40 @@
+# benchmark of the exact search throughput when scaling the number of worker processes
+import argparse
+import os
+import time
+import numpy as np
+
+from paperxai.report.search import ShardedExactSearch
+
+parser = argparse.ArgumentParser(description="Benchmark the sharded exact search in queries/sec from 1 to N cores")
+parser.add_argument("--n_rows", type=int, default=200000, help="number of synthetic paper embeddings")
+parser.add_argument("--dim", type=int, default=1536, help="embedding dimension (1536 for text-embedding-ada-002)")
+parser.add_argument("--n_queries", type=int, default=64, help="number of queries per batch")
+parser.add_argument("--n_repeats", type=int, default=5, help="number of batches searched per measurement")
+parser.add_argument("--max_workers", type=int, default=os.cpu_count(), help="maximum number of worker processes")
+args = parser.parse_args()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    papers_embedding = rng.standard_normal((args.n_rows, args.dim), dtype=np.float32)
+    query_embeddings = rng.standard_normal((args.n_queries, args.dim), dtype=np.float32)
+    n_workers_list = sorted(set([2**i for i in range(args.max_workers.bit_length()) if 2**i <= args.max_workers] + [args.max_workers]))
+    reference_indices = None
+    single_worker_throughput = None
+    for n_workers in n_workers_list:
+        with ShardedExactSearch(papers_embedding, n_workers=n_workers) as searcher:
+            indices, _ = searcher.search(query_embeddings, top_k=10)  # warm up the workers
+            start = time.perf_counter()
+            for _ in range(args.n_repeats):
+                searcher.search(query_embeddings, top_k=10)
+            elapsed = time.perf_counter() - start
+        if reference_indices is None:
+            reference_indices = indices
+        assert (indices == reference_indices).all(), "results differ between numbers of workers"
+        throughput = args.n_queries * args.n_repeats / elapsed
+        single_worker_throughput = single_worker_throughput or throughput
+        print(
+            f"{n_workers} workers: {throughput:,.1f} queries/sec, "
+            f"{throughput * args.n_rows:,.0f} scored rows/sec ({throughput / single_worker_throughput:.2f}x)"
+        )
@@ -1,4 +1,5 @@
-import pandas as pd
+import os
+import shutil
 import numpy as np
 import openai
 import argparse
@@ -6,8 +7,14 @@ import argparse
 import paperxai.constants as constants
 import paperxai.credentials as credentials
 from paperxai.llms import NAME_TO_LLM
+from paperxai.llms.cache import EmbeddingCache
+from paperxai.llms.scheduler import PRIORITY_BATCH
 from paperxai.papers import Arxiv
+from paperxai.papers.streaming import StreamingPipeline
+from paperxai.report.cache import RetrievalCache
 from paperxai.report.retriever import ReportRetriever
+from paperxai.report.checkpoint import RunManifest
+from paperxai.report.search import ShardedExactSearch
 from paperxai.prompt.base import Prompt
 from paperxai.loading import load_config
 
@@ -20,6 +27,45 @@ parser.add_argument(
     default=constants.ROOT_DIR + "/config.yml",
     help="path to config file",
 )
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="resume the last run for this config, skipping the work it already completed",
+)
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="reuse the answers of the previous report for questions whose retrieved papers did not change",
+)
+parser.add_argument(
+    "--reuse_threshold",
+    type=float,
+    default=0.0,
+    help="in incremental mode, maximum fraction of retrieved papers that may change for an answer to be reused",
+)
+parser.add_argument(
+    "--n_search_workers",
+    type=int,
+    default=1,
+    help="number of processes used to search the papers, use more than one for large corpora",
+)
+parser.add_argument(
+    "--streaming",
+    action="store_true",
+    help="fetch, embed and write the papers in chunks to bound the memory usage of this stage",
+)
+parser.add_argument(
+    "--chunk_size",
+    type=int,
+    default=100,
+    help="in streaming mode, number of papers processed at a time",
+)
+parser.add_argument(
+    "--max_memory_mb",
+    type=float,
+    default=None,
+    help="in streaming mode, fail if the peak memory traced while fetching and embedding the papers exceeds this ceiling (checked after each chunk, the report creation is not bounded)",
+)
 args = parser.parse_args()
 
 
@@ -28,29 +74,78 @@ if __name__ == "__main__":
     language_model = NAME_TO_LLM[config["language_model"]["provider"]](
         **config["language_model"]["init_args"]
     )
-    # get arxiv papers
-    arxiv = Arxiv()
-    arxiv.get_papers(categories=config["arxiv-categories"], max_results=int(config["max_papers"]))
-    arxiv.write_papers()
-    # load papers and compute embeddings
-    df_papers = pd.read_csv(constants.ROOT_DIR + "/data/arxiv/current_papers.csv",
-                            parse_dates=["Published Date"])
-    df_papers["Embeddings"] = df_papers["String_representation"].apply(
-    lambda x: language_model.get_embeddings(text=x)
-)
-    papers_embeddings = df_papers["Embeddings"].values
-    papers_embeddings = np.vstack(papers_embeddings)
-    # save embeddings
-    np.save(constants.ROOT_DIR + "/data/arxiv/papers_embeddings.npy", papers_embeddings)
+    # checkpoints of the run, stored per config file
+    config_name = os.path.splitext(os.path.basename(args.path_config))[0]
+    checkpoint = RunManifest(constants.ROOT_DIR + "/data/arxiv/runs/" + config_name)
+    if args.resume:
+        checkpoint.load()
+    else:
+        checkpoint.reset()
+    if args.streaming:
+        # get arxiv papers and compute embeddings chunk by chunk
+        if not checkpoint.is_stage_completed("embed"):
+            pipeline = StreamingPipeline(
+                Arxiv(),
+                language_model,
+                checkpoint,
+                chunk_size=args.chunk_size,
+                max_memory_mb=args.max_memory_mb,
+                priority=PRIORITY_BATCH,
+            )
+            memory_report = pipeline.run(
+                categories=config["arxiv-categories"],
+                max_results=int(config["max_papers"]),
+            )
+            if memory_report["n_papers"] == 0:
+                raise SystemExit("No new papers to create a report from.")
+        df_papers = checkpoint.load_fetched_papers()
+        papers_embeddings = np.load(checkpoint.path_embeddings, mmap_mode="r")
+        shutil.copyfile(checkpoint.path_embeddings, constants.ROOT_DIR + "/data/arxiv/papers_embeddings.npy")
+    else:
+        # get arxiv papers
+        if not checkpoint.is_stage_completed("fetch"):
+            arxiv = Arxiv()
+            arxiv.get_papers(categories=config["arxiv-categories"], max_results=int(config["max_papers"]))
+            arxiv.write_papers()
+            checkpoint.save_fetched_papers(constants.ROOT_DIR + "/data/arxiv/current_papers.csv")
+        # load papers and compute embeddings
+        df_papers = checkpoint.load_fetched_papers()
+        papers_embeddings = checkpoint.get_embeddings_with_checkpoints(
+            language_model, df_papers["String_representation"].tolist()
+        )
+        # save embeddings
+        np.save(constants.ROOT_DIR + "/data/arxiv/papers_embeddings.npy", papers_embeddings)
     # create report
+    path_answers = constants.ROOT_DIR + "/data/arxiv/answers/" + config_name + ".json"
     prompter = Prompt()
-    report_retriever = ReportRetriever(
-        language_model=language_model,
-        prompter=prompter,
-        papers_embedding=papers_embeddings,
-        df_papers=df_papers,
-        path_to_config_file=args.path_config,
-    )
-    report_retriever.create_report()
+    query_embeddings_cache = EmbeddingCache(constants.ROOT_DIR + "/data/cache/question_embeddings.json")
+    retrieval_cache = RetrievalCache(constants.ROOT_DIR + "/data/cache/retrieval_cache.json")
+    searcher = None
+    if args.n_search_workers > 1:
+        searcher = ShardedExactSearch(papers_embeddings, n_workers=args.n_search_workers)
+    try:
+        report_retriever = ReportRetriever(
+            language_model=language_model,
+            prompter=prompter,
+            papers_embedding=papers_embeddings,
+            df_papers=df_papers,
+            path_to_config_file=args.path_config,
+            checkpoint=checkpoint,
+            path_previous_answers=path_answers if args.incremental else None,
+            reuse_threshold=args.reuse_threshold,
+            searcher=searcher,
+            query_embeddings_cache=query_embeddings_cache,
+            retrieval_cache=retrieval_cache,
+            priority=PRIORITY_BATCH,
+        )
+        report_retriever.create_report()
+    finally:
+        # release the worker pool and shared memory even if a question fails
+        if searcher is not None:
+            searcher.close()
     report_retriever.print_report()
     report_retriever.write_report(format="html")
+    report_retriever.save_answers(path_answers)
+    query_embeddings_cache.save()
+    retrieval_cache.save()
+    checkpoint.complete_stage("report")
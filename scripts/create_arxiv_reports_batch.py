@@ -0,0 +1,115 @@
+# script to create one report per config file while sharing the arXiv fetch,
+# the paper embeddings and identical questions/prompts between configs
+import os
+import pandas as pd
+import numpy as np
+import openai
+import argparse
+
+import paperxai.constants as constants
+import paperxai.credentials as credentials
+from paperxai.llms import NAME_TO_LLM
+from paperxai.llms.cache import EmbeddingCache
+from paperxai.llms.scheduler import PRIORITY_BATCH
+from paperxai.papers import Arxiv
+from paperxai.report.cache import RetrievalCache
+from paperxai.report.retriever import ReportRetriever
+from paperxai.prompt.base import Prompt
+from paperxai.loading import load_config
+
+openai.api_key = credentials.OPENAI_API_KEY
+
+parser = argparse.ArgumentParser(description="Create one report per config file, sharing a single arXiv fetch and embedding pass between all of them")
+parser.add_argument(
+    "--path_configs",
+    type=str,
+    nargs="+",
+    required=True,
+    help="paths to the config files, one report is written per config",
+)
+args = parser.parse_args()
+
+
+def get_config_papers_mask(df_papers: pd.DataFrame, config: dict) -> np.ndarray:
+    """
+    Select the `max_papers` most recent papers listed (as primary or cross-listed category)
+    in one of the config's categories, i.e the papers the config would get if run alone.
+    """
+    config_categories = set(config["arxiv-categories"])
+    is_in_config_categories = (
+        df_papers.get("Categories", df_papers["Category"])
+        .fillna(df_papers["Category"])
+        .str.split(", ")
+        .apply(lambda categories: len(config_categories.intersection(categories)) > 0)
+    )
+    config_positions = np.flatnonzero(is_in_config_categories.values)
+    # the arXiv API returns the papers sorted by decreasing submission date
+    most_recent_positions = config_positions[
+        np.argsort(-df_papers["Published Date"].values[config_positions].astype("int64"), kind="stable")
+    ][: int(config["max_papers"])]
+    mask = np.zeros(len(df_papers), dtype=bool)
+    mask[most_recent_positions] = True
+    return mask
+
+
+def check_configs_share_language_model(configs: list[dict]) -> None:
+    """
+    Embeddings and chat responses are only shared if every config uses the same language model.
+    """
+    language_models = [config["language_model"] for config in configs]
+    if any(language_model != language_models[0] for language_model in language_models):
+        raise ValueError("All configs must define the same `language_model` to be run as a batch")
+
+
+if __name__ == "__main__":
+    configs = [load_config(path_config) for path_config in args.path_configs]
+    check_configs_share_language_model(configs)
+    language_model = NAME_TO_LLM[configs[0]["language_model"]["provider"]](
+        **configs[0]["language_model"]["init_args"]
+    )
+    # get arxiv papers for the union of all categories, with the sum of the papers budgets
+    # so that each config still gets up to its own `max_papers`
+    categories = sorted(
+        set(category for config in configs for category in config["arxiv-categories"])
+    )
+    arxiv = Arxiv()
+    arxiv.get_papers(
+        categories=categories,
+        max_results=sum(int(config["max_papers"]) for config in configs),
+    )
+    arxiv.write_papers()
+    # load papers and compute embeddings once for all configs
+    df_papers = pd.read_csv(constants.ROOT_DIR + "/data/arxiv/current_papers.csv",
+                            parse_dates=["Published Date"])
+    df_papers["Embeddings"] = df_papers["String_representation"].apply(
+        lambda x: language_model.get_embeddings(text=x, priority=PRIORITY_BATCH)
+    )
+    papers_embeddings = np.vstack(df_papers["Embeddings"].values)
+    np.save(constants.ROOT_DIR + "/data/arxiv/papers_embeddings.npy", papers_embeddings)
+    # create one report per config, sharing question embeddings and chat responses
+    prompter = Prompt()
+    query_embeddings_cache = EmbeddingCache(constants.ROOT_DIR + "/data/cache/question_embeddings.json")
+    retrieval_cache = RetrievalCache(constants.ROOT_DIR + "/data/cache/retrieval_cache.json")
+    chat_responses_cache = {}
+    for path_config, config in zip(args.path_configs, configs):
+        print("Creating report for config: " + path_config)
+        is_in_config_categories = get_config_papers_mask(df_papers, config)
+        report_retriever = ReportRetriever(
+            language_model=language_model,
+            prompter=prompter,
+            papers_embedding=papers_embeddings[is_in_config_categories],
+            df_papers=df_papers[is_in_config_categories],
+            path_to_config_file=path_config,
+            query_embeddings_cache=query_embeddings_cache,
+            chat_responses_cache=chat_responses_cache,
+            retrieval_cache=retrieval_cache,
+            priority=PRIORITY_BATCH,
+        )
+        report_retriever.create_report()
+        config_name = os.path.splitext(os.path.basename(path_config))[0]
+        report_retriever.write_report(
+            format="html",
+            file_name=pd.Timestamp.now(tz="UTC").strftime("%Y-%m-%d") + "-" + config_name + "-report.html",
+        )
+    query_embeddings_cache.save()
+    retrieval_cache.save()
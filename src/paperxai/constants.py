@@ -2,6 +2,11 @@
 
 from pathlib import Path
 
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 ROOT_DIR = str(Path(__file__).parents[2])
 
 # papers specific constants
@@ -11,3 +16,6 @@ ARXIV_BASE_QUERY_PARAMS = {
     "sortOrder": "descending",
     "max_results": 1000,
 }
+
+# arrow backed strings speed up column-wise string operations, pyarrow is optional
+STRING_DTYPE = "string[pyarrow]" if pyarrow is not None else "string"
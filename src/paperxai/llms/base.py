@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Union
 import numpy as np
 
+from paperxai.llms.scheduler import PRIORITY_BATCH
+
 
 class BaseLLM(ABC):
     def __init__(self, provider: str):
@@ -15,11 +17,11 @@ class BaseLLM(ABC):
         pass
 
     @abstractmethod
-    def get_embeddings(self, text: str) -> np.ndarray:
+    def get_embeddings(self, text: Union[str, List[str]], priority: int = PRIORITY_BATCH) -> np.ndarray:
         pass
 
     @abstractmethod
-    def get_chat_response(self, prompt: str) -> str:
+    def get_chat_response(self, prompt: str, priority: int = PRIORITY_BATCH) -> str:
         pass
 
     def get_token_length_of_string(self, text: str) -> int:
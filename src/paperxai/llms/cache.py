@@ -0,0 +1,47 @@
+import json
+import os
+from typing import Optional
+import numpy as np
+
+from paperxai.llms.base import BaseLLM
+from paperxai.llms.scheduler import PRIORITY_BATCH
+
+
+class EmbeddingCache:
+    """
+    Cache of text embeddings keyed by embedding model and text, e.g for questions
+    that are asked again from one report to the next. The cache can be persisted as json.
+    """
+
+    def __init__(self, path_cache: Optional[str] = None) -> None:
+        self.path_cache = path_cache
+        self.embeddings = {}
+        if path_cache is not None and os.path.exists(path_cache):
+            with open(path_cache, "r") as f:
+                self.embeddings = {
+                    model: {text: np.array(embedding) for text, embedding in model_embeddings.items()}
+                    for model, model_embeddings in json.load(f).items()
+                }
+
+    def get_embeddings(self, language_model: BaseLLM, text: str, priority: int = PRIORITY_BATCH) -> np.ndarray:
+        """
+        Get the embedding of the text from the cache, calling the language model on a miss.
+        """
+        model = getattr(language_model, "embedding_model", language_model.provider)
+        model_embeddings = self.embeddings.setdefault(model, {})
+        if text not in model_embeddings:
+            model_embeddings[text] = np.array(language_model.get_embeddings(text, priority=priority))
+        return model_embeddings[text]
+
+    def save(self) -> None:
+        if self.path_cache is None:
+            return
+        os.makedirs(os.path.dirname(self.path_cache), exist_ok=True)
+        with open(self.path_cache, "w") as f:
+            json.dump(
+                {
+                    model: {text: embedding.tolist() for text, embedding in model_embeddings.items()}
+                    for model, model_embeddings in self.embeddings.items()
+                },
+                f,
+            )
@@ -1,10 +1,11 @@
-from typing import Union
+from typing import Callable, Union
 import openai
 import tiktoken
 import numpy as np
 from tenacity import retry, wait_random_exponential, stop_after_attempt
 
 from paperxai.llms import BaseLLM
+from paperxai.llms.scheduler import PRIORITY_BATCH, get_scheduler
 
 
 class OpenAI(BaseLLM):
@@ -14,35 +15,78 @@ class OpenAI(BaseLLM):
         embedding_model: str = "text-embedding-ada-002",
         temperature: int = 0.0,
         max_tokens: int = 1000,
+        chat_requests_per_minute: int = 3500,
+        chat_tokens_per_minute: int = 90000,
+        embedding_requests_per_minute: int = 3000,
+        embedding_tokens_per_minute: int = 1000000,
     ) -> None:
         self.chat_model = chat_model
         self.embedding_model = embedding_model
         super().__init__(provider="openai")
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # all calls share the provider's queue, quotas are per model
+        self.scheduler = get_scheduler("openai")
+        self.scheduler.add_quota(chat_model, chat_requests_per_minute, chat_tokens_per_minute)
+        self.scheduler.add_quota(
+            embedding_model, embedding_requests_per_minute, embedding_tokens_per_minute
+        )
 
     def set_tokenizer(self):
         self.tokenizer = tiktoken.encoding_for_model(self.chat_model)
 
-    @retry(wait=wait_random_exponential(min=1, max=10), stop=stop_after_attempt(3))
-    def get_chat_response(self, prompt: str) -> str:
-        response = openai.ChatCompletion.create(
-            model=self.chat_model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
+    @retry(wait=wait_random_exponential(min=1, max=10), stop=stop_after_attempt(6))
+    def get_chat_response(self, prompt: str, priority: int = PRIORITY_BATCH) -> str:
+        response = self.schedule_request(
+            lambda: openai.ChatCompletion.create(
+                model=self.chat_model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+            ),
+            quota=self.chat_model,
+            n_tokens=self.get_token_length_of_string(prompt) + self.max_tokens,
+            priority=priority,
         )
         return response["choices"][0]["message"]["content"]
 
-    @retry(wait=wait_random_exponential(min=1, max=10), stop=stop_after_attempt(3))
-    def get_embeddings(self, text: Union[str, list]) -> np.ndarray:
-        if isinstance(text, str):
+    @retry(wait=wait_random_exponential(min=1, max=10), stop=stop_after_attempt(6))
+    def get_embeddings(self, text: Union[str, list], priority: int = PRIORITY_BATCH) -> np.ndarray:
+        """
+        Embed a string (returns a 1D array) or a list of strings (returns one row per string).
+        """
+        is_single_text = isinstance(text, str)
+        if is_single_text:
             text = [text]
-        embedding = openai.Embedding.create(
-            model=self.embedding_model,
-            input=text,
+        embedding = self.schedule_request(
+            lambda: openai.Embedding.create(
+                model=self.embedding_model,
+                input=text,
+            ),
+            quota=self.embedding_model,
+            n_tokens=sum(self.get_token_length_of_string(t) for t in text),
+            priority=priority,
         )
-        return np.array(embedding["data"][0]["embedding"])
+        if is_single_text:
+            return np.array(embedding["data"][0]["embedding"])
+        return np.array([data["embedding"] for data in sorted(embedding["data"], key=lambda x: x["index"])])
+
+    def schedule_request(
+        self, request: Callable, quota: str, n_tokens: int, priority: int
+    ) -> dict:
+        """
+        Wait for the scheduler to allow the request on the model's quota, send it and
+        feed back the actual token usage or the rate limit headers to the scheduler.
+        """
+        self.scheduler.acquire(quota, n_tokens, priority=priority)
+        try:
+            response = request()
+        except openai.error.RateLimitError as error:
+            self.scheduler.update_from_headers(quota, error.headers)
+            raise
+        if "usage" in response:
+            self.scheduler.update_token_usage(quota, n_tokens, response["usage"]["total_tokens"])
+        return response
 
     def get_function_call_response(self) -> str:
         pass
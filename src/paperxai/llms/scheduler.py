@@ -0,0 +1,176 @@
+import heapq
+import itertools
+import re
+import threading
+import time
+from typing import Mapping, Optional
+
+# lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_SCHEDULERS = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously so that `capacity` units are available per minute.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = float(capacity)
+        self.available = float(capacity)
+        self.last_refill = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.last_refill
+        self.available = min(self.capacity, self.available + elapsed * self.capacity / 60)
+        self.last_refill = now
+
+    def time_until_available(self, amount: float, now: float) -> float:
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.available
+        if missing <= 0:
+            return 0.0
+        return missing * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        self.available -= min(amount, self.capacity)
+
+    def set_capacity(self, capacity: int) -> None:
+        self.capacity = float(capacity)
+        self.available = min(self.available, self.capacity)
+
+    def set_available(self, available: float, now: float) -> None:
+        self.available = min(float(available), self.capacity)
+        self.last_refill = now
+
+
+class RequestScheduler:
+    """
+    Schedule provider calls so that they stay under the requests per minute (RPM)
+    and tokens per minute (TPM) quotas instead of reacting to rate limit errors.
+    A provider can have several quotas (e.g one per model), each with its own buckets
+    and its own queue: calls waiting on the same quota are served by priority
+    (see `PRIORITY_INTERACTIVE` and `PRIORITY_BATCH`) then in arrival order, while a
+    call waiting on an exhausted quota never blocks calls on another quota.
+    """
+
+    def __init__(self) -> None:
+        self.requests_buckets = {}
+        self.tokens_buckets = {}
+        self.paused_until = {}
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._counter = itertools.count()
+
+    def add_quota(self, quota: str, requests_per_minute: int, tokens_per_minute: int) -> None:
+        """
+        Register the limits of a quota, limits of an already known quota are left unchanged
+        as they may have been adapted from the rate limit headers.
+        """
+        with self._condition:
+            if quota in self.requests_buckets:
+                return
+            self.requests_buckets[quota] = TokenBucket(requests_per_minute)
+            self.tokens_buckets[quota] = TokenBucket(tokens_per_minute)
+            self.paused_until[quota] = 0.0
+            self._queues[quota] = []
+
+    def acquire(self, quota: str, n_tokens: int, priority: int = PRIORITY_BATCH) -> None:
+        """
+        Block until a request of `n_tokens` tokens can be sent without exceeding the quota.
+        """
+        with self._condition:
+            queue = self._queues[quota]
+            ticket = (priority, next(self._counter))
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if queue[0] == ticket:
+                        now = time.monotonic()
+                        timeout = max(
+                            self.paused_until[quota] - now,
+                            self.requests_buckets[quota].time_until_available(1, now),
+                            self.tokens_buckets[quota].time_until_available(n_tokens, now),
+                        )
+                        if timeout <= 0:
+                            self.requests_buckets[quota].consume(1)
+                            self.tokens_buckets[quota].consume(n_tokens)
+                            heapq.heappop(queue)
+                            self._condition.notify_all()
+                            return
+                    self._condition.wait(timeout=timeout)
+            except BaseException:
+                if ticket in queue:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    self._condition.notify_all()
+                raise
+
+    def update_token_usage(self, quota: str, estimated_tokens: int, used_tokens: int) -> None:
+        """
+        Correct the tokens bucket once the actual usage of a request is known.
+        """
+        with self._condition:
+            tokens_bucket = self.tokens_buckets[quota]
+            tokens_bucket.refill(time.monotonic())
+            tokens_bucket.available = min(
+                tokens_bucket.capacity,
+                tokens_bucket.available + estimated_tokens - used_tokens,
+            )
+            self._condition.notify_all()
+
+    def update_from_headers(self, quota: str, headers: Optional[Mapping[str, str]]) -> None:
+        """
+        Adapt the quota's buckets to the rate limit headers sent back by the provider, see
+        https://platform.openai.com/docs/guides/rate-limits/rate-limits-in-headers
+        """
+        if not headers:
+            return
+        headers = {key.lower(): value for key, value in headers.items()}
+        with self._condition:
+            now = time.monotonic()
+            for suffix, bucket in [
+                ("requests", self.requests_buckets[quota]),
+                ("tokens", self.tokens_buckets[quota]),
+            ]:
+                if "x-ratelimit-limit-" + suffix in headers:
+                    bucket.set_capacity(int(headers["x-ratelimit-limit-" + suffix]))
+                if "x-ratelimit-remaining-" + suffix in headers:
+                    bucket.set_available(int(headers["x-ratelimit-remaining-" + suffix]), now)
+            if "retry-after" in headers:
+                self.paused_until[quota] = max(self.paused_until[quota], now + float(headers["retry-after"]))
+            elif (
+                headers.get("x-ratelimit-remaining-requests") == "0"
+                or headers.get("x-ratelimit-remaining-tokens") == "0"
+            ):
+                reset_seconds = max(
+                    parse_reset_duration(headers.get("x-ratelimit-reset-requests", "")),
+                    parse_reset_duration(headers.get("x-ratelimit-reset-tokens", "")),
+                )
+                self.paused_until[quota] = max(self.paused_until[quota], now + reset_seconds)
+            self._condition.notify_all()
+
+
+def parse_reset_duration(duration: str) -> float:
+    """
+    Parse the reset durations sent in rate limit headers (e.g "1s", "6m0s", "20ms") to seconds.
+    """
+    unit_to_seconds = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(
+        float(value) * unit_to_seconds[unit]
+        for value, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", duration)
+    )
+
+
+def get_scheduler(provider: str) -> RequestScheduler:
+    """
+    Get the scheduler shared by every caller of the same provider, creating it on first use.
+    """
+    with _SCHEDULERS_LOCK:
+        if provider not in _SCHEDULERS:
+            _SCHEDULERS[provider] = RequestScheduler()
+        return _SCHEDULERS[provider]
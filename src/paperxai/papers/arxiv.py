@@ -1,4 +1,6 @@
 import os
+import time
+from typing import Iterator
 import requests
 from datetime import datetime, timedelta, timezone
 import pandas as pd
@@ -40,6 +42,33 @@ class Arxiv(BasePapers):
         # parse and store response
         self.df_papers = self.parse_paper_information_from_response(response)
 
+    def get_papers_in_chunks(self, categories: list[str], max_results: int = 1000, chunk_size: int = 100, start: int = 0, delay_seconds: float = 3.0) -> Iterator[tuple[int, pd.DataFrame]]:
+        """
+        Get the latest papers like `get_papers`, one page of at most `chunk_size` papers at a time,
+        starting from the `start`-th paper. The start of each page and its papers are yielded,
+        the papers are not stored in `df_papers`.
+        Pages are requested `delay_seconds` apart as asked by the arXiv API terms of use and
+        a failed request raises an error, so that a checkpointed run can be resumed.
+        """
+        query_params = dict(self.query_params)
+        query_params["search_query"] = " OR ".join(["cat:" + category for category in categories])
+        for page_start in range(start, max_results, chunk_size):
+            if page_start > start:
+                time.sleep(delay_seconds)
+            query_params["start"] = page_start
+            query_params["max_results"] = min(chunk_size, max_results - page_start)
+            response = requests.get(self.base_url, params=query_params)
+            df_chunk = self.parse_paper_information_from_response(response)
+            if df_chunk is None:
+                raise RuntimeError(
+                    f"Failed to fetch the papers starting at {page_start} from the arXiv API "
+                    f"(status code {response.status_code})."
+                )
+            # papers are sorted by submission date, an empty page means there are no more recent papers
+            if len(df_chunk) == 0:
+                return
+            yield page_start, df_chunk
+
     def parse_paper_information_from_response(self, response: str, start_date = datetime.now() - timedelta(weeks=10), end_date = datetime.now()) -> pd.DataFrame:
         """
         Parse the response from the arXiv API.
@@ -62,6 +91,9 @@ class Arxiv(BasePapers):
             )
             published_date = entry.published.text
             category = entry.category["term"]  # primary category
+            categories = ", ".join(
+                [entry_category["term"] for entry_category in entry.find_all("category")]
+            )  # primary and cross-listed categories
             paper_id = entry.id.text.split("/")[-1]  # arXiv identifier
             paper_data = {
                 "Title": title,
@@ -70,24 +102,47 @@ class Arxiv(BasePapers):
                 "Authors": authors,
                 "Published Date": published_date,
                 "Category": category,
+                "Categories": categories,
                 "Paper ID": paper_id,
             }
-            # add paper if published date is within the specified range
-            if start_date <= datetime.strptime(published_date, "%Y-%m-%dT%H:%M:%SZ") <= end_date:
-                papers_data.append(paper_data)
-        paper_data = self.format_dataframe(pd.DataFrame(papers_data))
+            papers_data.append(paper_data)
+        papers_data = pd.DataFrame(
+            papers_data,
+            columns=["Title", "URL", "Abstract", "Authors", "Published Date", "Category", "Categories", "Paper ID"],
+        )
+        # keep papers whose published date is within the specified range
+        published_dates = pd.to_datetime(papers_data["Published Date"], format="%Y-%m-%dT%H:%M:%SZ")
+        papers_data = papers_data[
+            published_dates.between(pd.Timestamp(start_date), pd.Timestamp(end_date))
+        ].reset_index(drop=True)
+        paper_data = self.format_dataframe(papers_data)
         return paper_data
 
     def format_dataframe(self, papers_data: pd.DataFrame) -> pd.DataFrame:
         """
         Format the papers dataframe, including dates and creating a string representation
-        for later embedding.
+        for later embedding. Column-wise equivalent of `create_string_to_embed`.
         """
-        papers_data["String_representation"] = papers_data.apply(
-            lambda x: self.create_string_to_embed(x), axis=1
-        )
+        title = papers_data["Title"].astype(constants.STRING_DTYPE)
+        abstract = papers_data["Abstract"].astype(constants.STRING_DTYPE)
+        first_author = papers_data["Authors"].astype(constants.STRING_DTYPE).str.split(",").str[0]
+        published_day = papers_data["Published Date"].astype(constants.STRING_DTYPE).str.split("T").str[0]
+        papers_data["String_representation"] = (
+            "Title: "
+            + title
+            + "\n"
+            + "Abstract: "
+            + abstract
+            + "\n"
+            + "First Author: "
+            + first_author.astype(constants.STRING_DTYPE)
+            + "\n"
+            + "Published Date: "
+            + published_day.astype(constants.STRING_DTYPE)
+            + "\n"
+        ).astype(papers_data["Title"].dtype)
         papers_data["Published Date"] = pd.to_datetime(
-            papers_data["Published Date"]
+            papers_data["Published Date"], utc=True
         ).dt.tz_convert(timezone.utc)
         return papers_data
 
@@ -0,0 +1,202 @@
+import os
+import shutil
+import tracemalloc
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from paperxai.llms.base import BaseLLM
+from paperxai.llms.scheduler import PRIORITY_BATCH
+from paperxai.papers.arxiv import Arxiv
+from paperxai.report.checkpoint import RunManifest
+
+
+class StreamingPipeline:
+    """
+    Fetch, embed and write papers in chunks of `chunk_size` papers so that memory usage
+    does not grow with the number of papers:
+    - papers are fetched one page at a time and only new papers (not in base_papers.csv) are kept
+    - each chunk is embedded with a single call and the vectors are written straight into a
+    preallocated memory mapped .npy file in the run folder
+    - the chunk is appended to the run's papers.csv and the progress saved in the run manifest,
+    so that a resumed run restarts from the next page and the rows already embedded
+    - once every chunk is done, the papers are written to current_papers.csv and base_papers.csv
+    The peak memory traced by `tracemalloc` during this fetch and embed stage is checked after
+    each chunk against `max_memory_mb`: a chunk going over the ceiling fails the run, it is not
+    prevented. Loading the papers back and creating the report afterwards are not bounded.
+    """
+
+    def __init__(
+        self,
+        papers: Arxiv,
+        language_model: BaseLLM,
+        checkpoint: RunManifest,
+        chunk_size: int = 100,
+        max_memory_mb: Optional[float] = None,
+        embedding_dtype: str = "float32",
+        priority: int = PRIORITY_BATCH,
+    ) -> None:
+        self.papers = papers
+        self.language_model = language_model
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size
+        self.max_memory_mb = max_memory_mb
+        self.embedding_dtype = embedding_dtype
+        self.priority = priority
+        self.path_embeddings_tmp = checkpoint.run_folder + "/papers_embeddings.tmp.npy"
+        self.memory_report = {}
+
+    def run(self, categories: list[str], max_results: int) -> dict:
+        """
+        Run the fetch and embed stage and return its peak memory report.
+        """
+        is_already_tracing = tracemalloc.is_tracing()
+        if not is_already_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            n_papers = self.stream_papers(categories, max_results)
+            peak_memory_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+        finally:
+            if not is_already_tracing:
+                tracemalloc.stop()
+        self.memory_report = {
+            "n_papers": n_papers,
+            "chunk_size": self.chunk_size,
+            "peak_memory_mb": peak_memory_mb,
+            "max_memory_mb": self.max_memory_mb,
+        }
+        print(
+            f"Streamed {n_papers} papers in chunks of {self.chunk_size}, "
+            f"peak traced memory {peak_memory_mb:.1f} MB"
+            + (f" (ceiling {self.max_memory_mb} MB)" if self.max_memory_mb else "")
+        )
+        return self.memory_report
+
+    def stream_papers(self, categories: list[str], max_results: int) -> int:
+        base_paper_ids = set()
+        if os.path.exists(self.papers.path_base_papers):
+            base_paper_ids = set(pd.read_csv(self.papers.path_base_papers, usecols=["Paper ID"])["Paper ID"])
+        progress = self.checkpoint.get_streaming_progress()
+        n_papers = progress["n_papers"]
+        streamed_paper_ids = self.load_streamed_paper_ids(n_papers)
+        embeddings = None
+        if n_papers > 0:
+            embeddings = np.lib.format.open_memmap(self.path_embeddings_tmp, mode="r+")
+        for start, df_chunk in self.papers.get_papers_in_chunks(
+            categories, max_results, self.chunk_size, start=progress["next_start"]
+        ):
+            df_chunk = df_chunk[
+                ~df_chunk["Paper ID"].isin(base_paper_ids) & ~df_chunk["Paper ID"].isin(streamed_paper_ids)
+            ]
+            if len(df_chunk) > 0:
+                chunk_embeddings = self.language_model.get_embeddings(
+                    df_chunk["String_representation"].tolist(), priority=self.priority
+                )
+                if embeddings is None:
+                    # the embedding dimension is only known once the first chunk is embedded
+                    embeddings = np.lib.format.open_memmap(
+                        self.path_embeddings_tmp,
+                        mode="w+",
+                        dtype=self.embedding_dtype,
+                        shape=(max_results, chunk_embeddings.shape[1]),
+                    )
+                embeddings[n_papers : n_papers + len(df_chunk)] = chunk_embeddings
+                embeddings.flush()
+                df_chunk.to_csv(
+                    self.checkpoint.path_papers,
+                    mode="w" if n_papers == 0 else "a",
+                    header=n_papers == 0,
+                    index=False,
+                )
+                streamed_paper_ids.update(df_chunk["Paper ID"])
+                n_papers += len(df_chunk)
+                del chunk_embeddings
+            del df_chunk
+            self.checkpoint.save_streaming_progress(next_start=start + self.chunk_size, n_papers=n_papers)
+            self.check_memory_ceiling()
+        if embeddings is None:
+            print("No new papers to write.")
+            return 0
+        self.write_embeddings_rows(embeddings, n_papers, self.checkpoint.path_embeddings)
+        del embeddings
+        self.write_papers(base_paper_ids)
+        self.checkpoint.complete_stage("fetch")
+        self.checkpoint.complete_stage("embed")
+        # only removed once the stages are complete, a resumed run still needs it before
+        os.remove(self.path_embeddings_tmp)
+        return n_papers
+
+    def load_streamed_paper_ids(self, n_papers: int) -> set:
+        """
+        Get the ids of the papers streamed by a previous attempt of the run, dropping the rows
+        of a chunk whose progress was not saved.
+        """
+        if n_papers == 0:
+            return set()
+        paper_ids = pd.read_csv(self.checkpoint.path_papers, usecols=["Paper ID"])["Paper ID"]
+        if len(paper_ids) > n_papers:
+            pd.read_csv(self.checkpoint.path_papers).head(n_papers).to_csv(self.checkpoint.path_papers, index=False)
+        return set(paper_ids.head(n_papers))
+
+    def write_embeddings_rows(self, embeddings: np.ndarray, n_rows: int, path_embeddings: str) -> None:
+        """
+        Copy the first `n_rows` rows of the preallocated embeddings to `path_embeddings`, chunk by chunk.
+        """
+        embeddings_out = np.lib.format.open_memmap(
+            path_embeddings, mode="w+", dtype=embeddings.dtype, shape=(n_rows, embeddings.shape[1])
+        )
+        for start in range(0, n_rows, self.chunk_size):
+            embeddings_out[start : start + self.chunk_size] = embeddings[start : start + self.chunk_size]
+        embeddings_out.flush()
+        del embeddings_out
+
+    def write_papers(self, base_paper_ids: set) -> None:
+        """
+        Write the streamed papers to current_papers.csv and add them to base_papers.csv, chunk by chunk.
+        Papers already in base_papers.csv are skipped so that a retried write does not duplicate them.
+        The rows are aligned to the columns of base_papers.csv, which is first rewritten with the
+        union of the columns if the streamed papers have new ones (e.g written by an older version).
+        """
+        shutil.copyfile(self.checkpoint.path_papers, self.papers.path_current_papers)
+        is_new_base_file = not os.path.exists(self.papers.path_base_papers)
+        streamed_columns = list(pd.read_csv(self.checkpoint.path_papers, nrows=0).columns)
+        if is_new_base_file:
+            base_columns = streamed_columns
+        else:
+            base_columns = list(pd.read_csv(self.papers.path_base_papers, nrows=0).columns)
+            new_columns = [column for column in streamed_columns if column not in base_columns]
+            if len(new_columns) > 0:
+                base_columns = base_columns + new_columns
+                self.rewrite_csv_with_columns(self.papers.path_base_papers, base_columns)
+        for df_chunk in pd.read_csv(self.checkpoint.path_papers, chunksize=self.chunk_size):
+            df_chunk = df_chunk[~df_chunk["Paper ID"].isin(base_paper_ids)]
+            df_chunk.reindex(columns=base_columns).to_csv(
+                self.papers.path_base_papers,
+                mode="w" if is_new_base_file else "a",
+                header=is_new_base_file,
+                index=False,
+            )
+            is_new_base_file = False
+        print("Data saved successfully.")
+
+    def rewrite_csv_with_columns(self, path_csv: str, columns: list[str]) -> None:
+        """
+        Rewrite a csv file chunk by chunk so that it has the given columns, in this order.
+        """
+        path_csv_tmp = path_csv + ".tmp"
+        for i, df_chunk in enumerate(pd.read_csv(path_csv, chunksize=self.chunk_size)):
+            df_chunk.reindex(columns=columns).to_csv(
+                path_csv_tmp, mode="w" if i == 0 else "a", header=i == 0, index=False
+            )
+        os.replace(path_csv_tmp, path_csv)
+
+    def check_memory_ceiling(self) -> None:
+        if self.max_memory_mb is None:
+            return
+        peak_memory_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+        if peak_memory_mb > self.max_memory_mb:
+            raise MemoryError(
+                f"Peak traced memory {peak_memory_mb:.1f} MB exceeds the {self.max_memory_mb} MB ceiling, "
+                "reduce the chunk size."
+            )
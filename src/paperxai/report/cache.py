@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+
+def get_corpus_fingerprint(
+    df_papers: pd.DataFrame, papers_embedding: np.ndarray, embedding_model: str, n_sampled_rows: int = 64
+) -> str:
+    """
+    Fingerprint of the papers searched by a retriever. It changes whenever the papers
+    change, e.g when `Arxiv.write_papers` writes new papers, or when they are embedded
+    with another model. A sample of evenly spaced embedding rows is hashed rather than
+    the whole matrix to keep it cheap for large corpora.
+    """
+    corpus_hash = hashlib.sha1()
+    corpus_hash.update("\n".join(df_papers["Paper ID"].astype(str)).encode())
+    corpus_hash.update(embedding_model.encode())
+    corpus_hash.update(str(np.shape(papers_embedding)).encode())
+    if papers_embedding is not None and len(papers_embedding) > 0:
+        sampled_rows = np.linspace(0, len(papers_embedding) - 1, min(n_sampled_rows, len(papers_embedding))).astype(int)
+        corpus_hash.update(np.ascontiguousarray(papers_embedding[sampled_rows]).tobytes())
+    return corpus_hash.hexdigest()
+
+
+class RetrievalCache:
+    """
+    Cache of the indices of the top k papers retrieved for a question, keyed by the
+    corpus fingerprint then by (question, top_k). Only the `max_corpus_versions` most
+    recently used corpus versions are kept, results for older versions are invalidated.
+    The cache can be persisted as json so that it is shared between runs.
+    """
+
+    def __init__(self, path_cache: Optional[str] = None, max_corpus_versions: int = 8) -> None:
+        self.path_cache = path_cache
+        self.max_corpus_versions = max_corpus_versions
+        self.results = OrderedDict()
+        if path_cache is not None and os.path.exists(path_cache):
+            with open(path_cache, "r") as f:
+                # corpus versions are saved from the least to the most recently used
+                for corpus_fingerprint, corpus_results in json.load(f).items():
+                    self.results[corpus_fingerprint] = {
+                        (question, top_k): np.array(indices, dtype=int)
+                        for question, top_k, indices in corpus_results
+                    }
+
+    def get(self, corpus_fingerprint: str, question: str, top_k: int) -> Optional[np.ndarray]:
+        if corpus_fingerprint not in self.results:
+            return None
+        self.results.move_to_end(corpus_fingerprint)
+        return self.results[corpus_fingerprint].get((question, top_k))
+
+    def set(self, corpus_fingerprint: str, question: str, top_k: int, indices: np.ndarray) -> None:
+        self.results.setdefault(corpus_fingerprint, {})[(question, top_k)] = indices
+        self.results.move_to_end(corpus_fingerprint)
+        while len(self.results) > self.max_corpus_versions:
+            self.results.popitem(last=False)
+
+    def save(self) -> None:
+        if self.path_cache is None:
+            return
+        os.makedirs(os.path.dirname(self.path_cache), exist_ok=True)
+        with open(self.path_cache, "w") as f:
+            json.dump(
+                {
+                    corpus_fingerprint: [
+                        [question, top_k, np.asarray(indices).tolist()]
+                        for (question, top_k), indices in corpus_results.items()
+                    ]
+                    for corpus_fingerprint, corpus_results in self.results.items()
+                },
+                f,
+            )
@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from paperxai.llms.base import BaseLLM
+from paperxai.llms.scheduler import PRIORITY_BATCH
+
+
+class RunManifest:
+    """
+    Checkpoints of a report run so that it can be resumed after a failure.
+    The run folder contains:
+    - manifest.json: completed stages and per question checkpoints (retrieved paper ids, chat response,
+    whether it was freshly generated and the ids of the papers it was generated from)
+    - papers.csv: the papers fetched for this run
+    - papers_embeddings.npy: the embeddings computed so far, in the order of papers.csv
+    In streaming mode the manifest also records the streaming progress, see `StreamingPipeline`.
+    """
+
+    def __init__(self, run_folder: str) -> None:
+        self.run_folder = run_folder
+        self.path_manifest = run_folder + "/manifest.json"
+        self.path_papers = run_folder + "/papers.csv"
+        self.path_embeddings = run_folder + "/papers_embeddings.npy"
+        self.manifest = {"stages": {}, "questions": {}}
+
+    def load(self) -> None:
+        """
+        Load the checkpoints of a previous run, starting a new run if there is none.
+        """
+        if not os.path.exists(self.path_manifest):
+            self.reset()
+            return
+        with open(self.path_manifest, "r") as f:
+            self.manifest = json.load(f)
+
+    def reset(self) -> None:
+        """
+        Remove the checkpoints of any previous run and start a new one.
+        """
+        if os.path.exists(self.run_folder):
+            shutil.rmtree(self.run_folder)
+        os.makedirs(self.run_folder)
+        self.manifest = {"stages": {}, "questions": {}}
+        self.save()
+
+    def save(self) -> None:
+        # write to a temporary file first so a crash never leaves a truncated manifest
+        os.makedirs(self.run_folder, exist_ok=True)
+        with open(self.path_manifest + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(self.path_manifest + ".tmp", self.path_manifest)
+
+    def is_stage_completed(self, stage: str) -> bool:
+        return self.manifest["stages"].get(stage, False)
+
+    def complete_stage(self, stage: str) -> None:
+        self.manifest["stages"][stage] = True
+        self.save()
+
+    def save_fetched_papers(self, path_papers: str) -> None:
+        """
+        Keep a copy of the fetched papers as later runs overwrite `current_papers.csv`.
+        """
+        shutil.copyfile(path_papers, self.path_papers)
+        self.complete_stage("fetch")
+
+    def load_fetched_papers(self) -> pd.DataFrame:
+        return pd.read_csv(self.path_papers, parse_dates=["Published Date"])
+
+    def get_embeddings_with_checkpoints(
+        self,
+        language_model: BaseLLM,
+        strings: list[str],
+        checkpoint_every: int = 50,
+        priority: int = PRIORITY_BATCH,
+    ) -> np.ndarray:
+        """
+        Embed the strings, starting from the rows already embedded in a previous run
+        and saving the embedded rows every `checkpoint_every` strings.
+        """
+        embeddings = []
+        if os.path.exists(self.path_embeddings):
+            embeddings = list(np.load(self.path_embeddings))
+        for i in range(len(embeddings), len(strings)):
+            embeddings.append(language_model.get_embeddings(text=strings[i], priority=priority))
+            if (i + 1) % checkpoint_every == 0:
+                np.save(self.path_embeddings, np.vstack(embeddings))
+        embeddings = np.vstack(embeddings)
+        np.save(self.path_embeddings, embeddings)
+        self.complete_stage("embed")
+        return embeddings
+
+    def get_streaming_progress(self) -> dict:
+        return self.manifest.get("streaming", {"next_start": 0, "n_papers": 0})
+
+    def save_streaming_progress(self, next_start: int, n_papers: int) -> None:
+        self.manifest["streaming"] = {"next_start": next_start, "n_papers": n_papers}
+        self.save()
+
+    def get_question_checkpoint(self, question: str) -> dict:
+        return self.manifest["questions"].get(question, {})
+
+    def save_retrieved_paper_ids(self, question: str, paper_ids: list[str]) -> None:
+        self.manifest["questions"].setdefault(question, {})["paper_ids"] = paper_ids
+        self.save()
+
+    def save_chat_response(
+        self, question: str, chat_response: Optional[str], is_fresh: bool, answer_paper_ids: list[str]
+    ) -> None:
+        question_checkpoint = self.manifest["questions"].setdefault(question, {})
+        question_checkpoint["chat_response"] = chat_response
+        question_checkpoint["is_fresh"] = is_fresh
+        question_checkpoint["answer_paper_ids"] = answer_paper_ids
+        self.save()
@@ -1,12 +1,18 @@
+import json
+import os
 from typing import Optional, Union
 from datetime import datetime, timezone
 import numpy as np
-from scipy import spatial
 import pandas as pd
 
 from paperxai.llms.base import BaseLLM
+from paperxai.llms.cache import EmbeddingCache
+from paperxai.llms.scheduler import PRIORITY_BATCH
 from paperxai.loading import load_config
 from paperxai.prompt.base import Prompt
+from paperxai.report.cache import RetrievalCache, get_corpus_fingerprint
+from paperxai.report.checkpoint import RunManifest
+from paperxai.report.search import ShardedExactSearch
 import paperxai.constants as constants
 
 
@@ -19,6 +25,14 @@ class ReportRetriever:
         df_papers: pd.DataFrame,
         path_to_config_file: Optional[str] = constants.ROOT_DIR + "/config.yml",
         config: dict[str, Union[str, dict]] = None,
+        query_embeddings_cache: Optional[EmbeddingCache] = None,
+        chat_responses_cache: Optional[dict[str, str]] = None,
+        retrieval_cache: Optional[RetrievalCache] = None,
+        checkpoint: Optional[RunManifest] = None,
+        path_previous_answers: Optional[str] = None,
+        reuse_threshold: float = 0.0,
+        searcher: Optional[ShardedExactSearch] = None,
+        priority: int = PRIORITY_BATCH,
     ):
         self.language_model = language_model
         self.prompter = prompter
@@ -29,21 +43,61 @@ class ReportRetriever:
         self.config = load_config(path_to_config_file)
         if config:
             self.config = config
+        # caches can be shared between retrievers (e.g batch report creation, webapp) so
+        # that identical questions/prompts are only sent once to the language model
+        self.query_embeddings_cache = (
+            query_embeddings_cache if query_embeddings_cache is not None else EmbeddingCache()
+        )
+        self.chat_responses_cache = (
+            chat_responses_cache if chat_responses_cache is not None else {}
+        )
+        self.retrieval_cache = (
+            retrieval_cache if retrieval_cache is not None else RetrievalCache()
+        )
+        self.corpus_fingerprint = (
+            get_corpus_fingerprint(
+                df_papers,
+                papers_embedding,
+                getattr(language_model, "embedding_model", language_model.provider),
+            )
+            if df_papers is not None
+            else None
+        )
+        self.checkpoint = checkpoint
+        # incremental mode: answers of the previous report are reused when the
+        # fraction of retrieved papers that changed is below `reuse_threshold`
+        self.previous_answers = None
+        if path_previous_answers is not None:
+            self.previous_answers = {}
+            if os.path.exists(path_previous_answers):
+                with open(path_previous_answers, "r") as f:
+                    self.previous_answers = json.load(f)
+        self.reuse_threshold = reuse_threshold
+        # ids of the papers each answer was generated from, which differ from the
+        # retrieved papers when the answer is reused from the previous report
+        self.answers_paper_ids = {}
+        # optional multi-process search over `papers_embedding`, for large corpora
+        self.searcher = searcher
+        # number of papers retrieved per question of the report
+        self.report_top_k = 3
+        # priority of the language model calls, see `paperxai.llms.scheduler`
+        self.priority = priority
 
-    def write_report(self, format: str = "html") -> None:
+    def write_report(self, format: str = "html", file_name: Optional[str] = None) -> None:
         """
         Write the report to a file in the chosen format
         """
         if format == "html":
-            self.write_html_report()
+            self.write_html_report(file_name=file_name)
         elif format == "md":
             self.write_md_report()
         else:
             raise ValueError("Format not supported")
         
-    def write_html_report(self) -> None:
+    def write_html_report(self, file_name: Optional[str] = None) -> None:
         """
-        Write the report to a html file using a template defined in `display/template.html`
+        Write the report to a html file using a template defined in `display/template.html`.
+        By default the file is named `{Y-m-d}-report.html`.
         """
         if self.report == {}:
             raise ValueError("Report is empty. Please run `create_report` first")
@@ -55,9 +109,11 @@ class ReportRetriever:
             template_html_string = f.read()
         template_html_string = template_html_string.replace("{report_string}", report_html_string)
         template_html_string = template_html_string.replace("{oldest_paper_date_string}", oldest_date_in_report_papers)
-        with open(constants.ROOT_DIR + "/display/reports/"+current_date+"-report.html", "w") as f:
+        if file_name is None:
+            file_name = current_date + "-report.html"
+        with open(constants.ROOT_DIR + "/display/reports/" + file_name, "w") as f:
             f.write(template_html_string)
-        print(f"HTML is saved to /display/reports/{current_date}-report.html, open it in your browser to view the report")
+        print(f"HTML is saved to /display/reports/{file_name}, open it in your browser to view the report")
 
     def write_md_report(self) -> None:
         """
@@ -87,7 +143,11 @@ class ReportRetriever:
             if isinstance(section_info["questions"], list):
                 for i in range(len(section_info["questions"])):
                     report_html_string += "<h3> Question: " + section_info['questions'][i] + "</h3>"
-                    report_html_string += "<p> LLM response: " + section_info['chat_responses'][i] + "</p>"
+                    report_html_string += "<p> LLM response: "
+                    # only mark fresh answers when the report was created incrementally
+                    if self.previous_answers is not None and section_info['is_fresh'][i]:
+                        report_html_string += '<span class="fresh">[new]</span> '
+                    report_html_string += section_info['chat_responses'][i] + "</p>"
                     # add papers
                     report_html_string += "<h4> Papers </h4>"
                     report_html_string += self.format_paper_df_to_html_citation(section_info['papers'][i])
@@ -98,11 +158,18 @@ class ReportRetriever:
         """
         Format the dataframe of papers to html citations
         """
-        citation_list = []
-        for _, row in df_papers.iterrows():
-            citation_list.append(
-                f"<li> {row['Title']}. {row['Authors'].split(',')[0].split(' ')[-1]} et al. {row['Published Date'].strftime('%Y')}</li>"
-            )
+        first_author_last_name = (
+            df_papers["Authors"].astype(constants.STRING_DTYPE).str.split(",").str[0].str.split(" ").str[-1]
+        )
+        citation_list = (
+            "<li> "
+            + df_papers["Title"].astype(constants.STRING_DTYPE)
+            + ". "
+            + first_author_last_name.astype(constants.STRING_DTYPE)
+            + " et al. "
+            + df_papers["Published Date"].dt.strftime("%Y").astype(constants.STRING_DTYPE)
+            + "</li>"
+        )
         return "<ul>" + "".join(citation_list) + "</ul>"
 
     def create_report(self) -> dict:
@@ -112,6 +179,11 @@ class ReportRetriever:
         """
         report = {}
         sections = self.config["sections"]
+        if self.searcher is not None:
+            self.search_questions_in_batch(
+                [question for section_info in sections.values() for question in section_info["questions"]],
+                top_k=self.report_top_k,
+            )
         for section_number, section_info in sections.items():
             print("Getting responses for section: " + section_info["title"])
             responses = [
@@ -119,52 +191,149 @@ class ReportRetriever:
             ]
             chat_responses = [response[0] for response in responses]
             top_k_papers = [response[1] for response in responses]
+            is_fresh = [response[2] for response in responses]
             report[section_info["title"]] = {
                 "questions": section_info["questions"],
                 "chat_responses": chat_responses,
-                "papers": top_k_papers
+                "papers": top_k_papers,
+                "is_fresh": is_fresh,
             }
         self.report = report
         return report
 
 
-    def get_chat_response_and_papers_to_question(self, question: str) -> tuple[str, pd.DataFrame]:
+    def save_answers(self, path_answers: str) -> None:
+        """
+        Save the answer of each question of the report with the ids of the papers it
+        was generated from, to be reused by the next report created incrementally.
+        """
+        if self.report == {}:
+            raise ValueError("Report is empty. Please run `create_report` first")
+        answers = {}
+        for section_info in self.report.values():
+            for i in range(len(section_info["questions"])):
+                answers[section_info["questions"][i]] = {
+                    "paper_ids": self.answers_paper_ids[section_info["questions"][i]],
+                    "chat_response": section_info["chat_responses"][i],
+                }
+        os.makedirs(os.path.dirname(path_answers), exist_ok=True)
+        with open(path_answers, "w") as f:
+            json.dump(answers, f, indent=2)
+
+    def get_previous_chat_response(self, question: str, top_k_papers: pd.DataFrame) -> Optional[tuple[str, list[str]]]:
+        """
+        Get the answer of the previous report to this question and the ids of the papers
+        it was generated from if the retrieved papers changed less than `reuse_threshold`
+        from these papers, None otherwise.
+        """
+        if self.previous_answers is None or question not in self.previous_answers:
+            return None
+        previous_answer = self.previous_answers[question]
+        paper_ids = set(top_k_papers["Paper ID"])
+        if len(paper_ids) == 0:
+            return None
+        changed_fraction = len(paper_ids - set(previous_answer["paper_ids"])) / len(paper_ids)
+        if changed_fraction <= self.reuse_threshold:
+            return previous_answer["chat_response"], previous_answer["paper_ids"]
+        return None
+
+    def get_chat_response_and_papers_to_question(self, question: str) -> tuple[str, pd.DataFrame, bool]:
         """
         Embed question, retrieved top k papers and feed them as context
-        to the language model to get a summary
+        to the language model to get a summary. Also returns whether the
+        summary was freshly generated or reused from the previous report.
         """
         print("Answering question: " + question)
-        top_k_papers = self.retrieve_top_k_papers(question, top_k = 3)
+        question_checkpoint = (
+            self.checkpoint.get_question_checkpoint(question) if self.checkpoint else {}
+        )
+        if "paper_ids" in question_checkpoint:
+            top_k_papers = self.get_papers_from_ids(question_checkpoint["paper_ids"])
+        else:
+            top_k_papers = self.retrieve_top_k_papers(question, top_k=self.report_top_k)
+            if self.checkpoint:
+                self.checkpoint.save_retrieved_paper_ids(
+                    question, top_k_papers["Paper ID"].tolist()
+                )
         self.report_papers = pd.concat([self.report_papers, top_k_papers])
         prompt = self.prompter.create_prompt_for_report(
             question, top_k_papers
         )
-        chat_response = self.language_model.get_chat_response(
-            prompt
-        )
-        return chat_response, top_k_papers
+        if "chat_response" in question_checkpoint:
+            self.answers_paper_ids[question] = question_checkpoint["answer_paper_ids"]
+            return question_checkpoint["chat_response"], top_k_papers, question_checkpoint["is_fresh"]
+        previous_answer = self.get_previous_chat_response(question, top_k_papers)
+        is_fresh = previous_answer is None
+        if is_fresh:
+            if prompt not in self.chat_responses_cache:
+                self.chat_responses_cache[prompt] = self.language_model.get_chat_response(
+                    prompt, priority=self.priority
+                )
+            chat_response = self.chat_responses_cache[prompt]
+            answer_paper_ids = top_k_papers["Paper ID"].tolist()
+        else:
+            chat_response, answer_paper_ids = previous_answer
+        self.answers_paper_ids[question] = answer_paper_ids
+        if self.checkpoint:
+            self.checkpoint.save_chat_response(question, chat_response, is_fresh, answer_paper_ids)
+        return chat_response, top_k_papers, is_fresh
+
+    def get_papers_from_ids(self, paper_ids: list[str]) -> pd.DataFrame:
+        """
+        Get the papers with the given ids, in the order of the ids.
+        """
+        positions = pd.Index(self.df_papers["Paper ID"]).get_indexer(paper_ids)
+        return self.df_papers.iloc[positions]
 
     def retrieve_top_k_papers(self, query: str, top_k: int = 10) -> list[int]:
         """
         Retrieve top k papers given query.
         """
-        query_embedding = self.language_model.get_embeddings(query)
-        query_embedding = np.array(query_embedding)
-        # calculate cosine similarity between query and all papers
-        cosine_similarities = np.array(
-            [
-                self.similarity_function(query_embedding, paper_embedding)
-                for paper_embedding in self.papers_embedding
-            ]
-        )
-        # get top k paper indices
-        top_k_papers_indices = np.argsort(cosine_similarities)[::-1][:top_k]
+        top_k_papers_indices = self.retrieval_cache.get(self.corpus_fingerprint, query, top_k)
+        if top_k_papers_indices is None:
+            top_k_papers_indices = self.search_top_k_papers_indices(query, top_k)
+            self.retrieval_cache.set(self.corpus_fingerprint, query, top_k, top_k_papers_indices)
         # take top k papers from dataframe
         top_k_papers = self.df_papers.iloc[top_k_papers_indices]
         return top_k_papers
 
-    def similarity_function(self, query: str, paper_embedding: str) -> float:
+    def search_questions_in_batch(self, questions: list[str], top_k: int) -> None:
+        """
+        Score all the questions missing from the retrieval cache with a single call
+        to the searcher and store their top k papers indices in the cache.
+        """
+        questions = [
+            question
+            for question in dict.fromkeys(questions)
+            if self.retrieval_cache.get(self.corpus_fingerprint, question, top_k) is None
+        ]
+        if len(questions) == 0:
+            return
+        query_embeddings = np.vstack(
+            [
+                self.query_embeddings_cache.get_embeddings(self.language_model, question, priority=self.priority)
+                for question in questions
+            ]
+        )
+        top_k_papers_indices = self.searcher.search(query_embeddings, top_k=top_k)[0]
+        for question, indices in zip(questions, top_k_papers_indices):
+            self.retrieval_cache.set(self.corpus_fingerprint, question, top_k, indices)
+
+    def search_top_k_papers_indices(self, query: str, top_k: int = 10) -> np.ndarray:
         """
-        Calculate similarity between query and embedding
+        Embed the query and get the indices of the top k papers by cosine similarity.
         """
-        return 1 - spatial.distance.cosine(query, paper_embedding)
+        query_embedding = self.query_embeddings_cache.get_embeddings(
+            self.language_model, query, priority=self.priority
+        )
+        if self.searcher is not None:
+            top_k_papers_indices = self.searcher.search(query_embedding, top_k=top_k)[0][0]
+        else:
+            # calculate cosine similarity between query and all papers
+            cosine_similarities = (self.papers_embedding @ query_embedding) / (
+                np.linalg.norm(self.papers_embedding, axis=1) * np.linalg.norm(query_embedding)
+            )
+            # get top k paper indices
+            top_k_papers_indices = np.argsort(cosine_similarities)[::-1][:top_k]
+        return top_k_papers_indices
+
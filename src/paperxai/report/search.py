@@ -0,0 +1,94 @@
+import os
+from multiprocessing import Pool, shared_memory
+from typing import Optional
+import numpy as np
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# set in each worker process by `_attach_shared_embeddings`
+_shared_memory = None
+_shared_embeddings = None
+
+
+def _attach_shared_embeddings(name: str, shape: tuple[int, int], dtype: str) -> None:
+    """
+    Worker initializer: map the normalized embeddings held in shared memory without copying them.
+    """
+    global _shared_memory, _shared_embeddings
+    _shared_memory = shared_memory.SharedMemory(name=name)
+    _shared_embeddings = np.ndarray(shape, dtype=dtype, buffer=_shared_memory.buf)
+    # each worker scores its own shard, avoid oversubscribing the cores with BLAS threads
+    if threadpool_limits is not None:
+        threadpool_limits(limits=1)
+
+
+def _search_shard(query_embeddings: np.ndarray, start: int, end: int, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Score the queries against the rows [start, end) and return the shard's top k indices and scores.
+    """
+    scores = query_embeddings @ _shared_embeddings[start:end].T
+    k = min(top_k, end - start)
+    top_k_indices = np.argpartition(scores, -k, axis=1)[:, -k:]
+    return top_k_indices + start, np.take_along_axis(scores, top_k_indices, axis=1)
+
+
+class ShardedExactSearch:
+    """
+    Exact cosine similarity search parallelized over a pool of worker processes.
+    The normalized embeddings are written once to shared memory and split in one shard
+    per worker, each worker returns its shard's top k and the results are merged.
+    """
+
+    def __init__(self, papers_embedding: np.ndarray, n_workers: Optional[int] = None, dtype: str = "float32") -> None:
+        self.n_workers = n_workers or os.cpu_count()
+        self.shape = papers_embedding.shape
+        self.dtype = np.dtype(dtype)
+        self.shared_memory = shared_memory.SharedMemory(
+            create=True, size=max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        )
+        papers_embedding_normalized = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shared_memory.buf)
+        papers_embedding_normalized[:] = papers_embedding / np.linalg.norm(
+            papers_embedding, axis=1, keepdims=True
+        )
+        del papers_embedding_normalized
+        shard_boundaries = np.linspace(0, self.shape[0], self.n_workers + 1).astype(int)
+        self.shards = [
+            (start, end) for start, end in zip(shard_boundaries[:-1], shard_boundaries[1:]) if end > start
+        ]
+        self.pool = Pool(
+            processes=self.n_workers,
+            initializer=_attach_shared_embeddings,
+            initargs=(self.shared_memory.name, self.shape, self.dtype.str),
+        )
+
+    def search(self, query_embeddings: np.ndarray, top_k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the indices and cosine similarities of the top k papers for each query,
+        sorted by decreasing similarity. Returns arrays of shape (n_queries, top_k).
+        """
+        query_embeddings = np.atleast_2d(query_embeddings).astype(self.dtype)
+        query_embeddings = query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+        shard_results = self.pool.starmap(
+            _search_shard,
+            [(query_embeddings, start, end, top_k) for start, end in self.shards],
+        )
+        # merge the top k of each shard into the global top k
+        indices = np.concatenate([result[0] for result in shard_results], axis=1)
+        scores = np.concatenate([result[1] for result in shard_results], axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+        return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+
+    def __enter__(self) -> "ShardedExactSearch":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from paperxai.llms.scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    RequestScheduler,
+    TokenBucket,
+    parse_reset_duration,
+)
+
+
+def test_token_bucket_refills_capacity_per_minute():
+    bucket = TokenBucket(capacity=60)
+    now = bucket.last_refill
+    bucket.consume(60)
+    assert bucket.time_until_available(1, now) == 1.0
+    bucket.refill(now + 30)
+    assert bucket.available == 30
+    # never refills above capacity
+    bucket.refill(now + 600)
+    assert bucket.available == 60
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("1s") == 1
+    assert parse_reset_duration("6m0s") == 360
+    assert parse_reset_duration("20ms") == 0.02
+    assert parse_reset_duration("1h2m3.5s") == 3723.5
+    assert parse_reset_duration("") == 0
+
+
+def test_acquire_serves_higher_priority_first():
+    scheduler = RequestScheduler()
+    scheduler.add_quota("model", requests_per_minute=600, tokens_per_minute=100000)
+    scheduler.requests_buckets["model"].available = 0
+    served = []
+
+    def acquire(priority, name):
+        scheduler.acquire("model", 1, priority=priority)
+        served.append(name)
+
+    batch_threads = [threading.Thread(target=acquire, args=(PRIORITY_BATCH, f"batch {i}")) for i in range(2)]
+    for thread in batch_threads:
+        thread.start()
+    time.sleep(0.05)
+    interactive_thread = threading.Thread(target=acquire, args=(PRIORITY_INTERACTIVE, "interactive"))
+    interactive_thread.start()
+    for thread in batch_threads + [interactive_thread]:
+        thread.join(timeout=5)
+    assert served == ["interactive", "batch 0", "batch 1"]
+
+
+def test_exhausted_quota_does_not_block_other_quotas():
+    scheduler = RequestScheduler()
+    scheduler.add_quota("chat", requests_per_minute=60, tokens_per_minute=60)
+    scheduler.add_quota("embedding", requests_per_minute=60, tokens_per_minute=100000)
+    scheduler.tokens_buckets["chat"].available = 0
+    waiting_chat = threading.Thread(target=scheduler.acquire, args=("chat", 60), daemon=True)
+    waiting_chat.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    scheduler.acquire("embedding", 10)
+    assert time.monotonic() - start < 0.5
+    assert waiting_chat.is_alive()
+
+
+def test_update_from_headers_adapts_limits_and_pauses():
+    scheduler = RequestScheduler()
+    scheduler.add_quota("model", requests_per_minute=100, tokens_per_minute=1000)
+    scheduler.update_from_headers(
+        "model",
+        {"x-ratelimit-limit-requests": "20", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s"},
+    )
+    assert scheduler.requests_buckets["model"].capacity == 20
+    assert scheduler.paused_until["model"] > time.monotonic() + 1
+    # limits adapted from headers are kept when the quota is registered again
+    scheduler.add_quota("model", requests_per_minute=100, tokens_per_minute=1000)
+    assert scheduler.requests_buckets["model"].capacity == 20